@@ -2,16 +2,48 @@
 Utilities for checking authorization of certain resource types
 """
 import logging
-from typing import List, Tuple
+import os
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
 
 from samcli.commands.local.lib.swagger.reader import SwaggerReader
 from samcli.lib.providers.provider import Stack
 from samcli.lib.providers.sam_function_provider import SamFunctionProvider
+from samcli.lib.utils.resources import AWS_LAMBDA_FUNCTION, AWS_SERVERLESS_FUNCTION
+
+try:
+    import ijson
+except ImportError:
+    # ijson is installed with the `swagger-streaming` extra, without it swagger files are always read in full.
+    ijson = None
 
 LOG = logging.getLogger(__name__)
 
+# Marks the items of an array in the path of a streamed swagger value, as opposed to the keys of a map.
+_ARRAY_ITEM = object()
+
+# Function event types that are served through an api, mapped to the event property referring to that api.
+_EVENT_TYPE_TO_ID = {"Api": "RestApiId", "HttpApi": "ApiId"}
+
+# Resource types of the functions which can have events.
+_FUNCTION_TYPES = (AWS_SERVERLESS_FUNCTION, AWS_LAMBDA_FUNCTION)
+
+# Shared read-only default for missing resources and properties, instead of a new empty dict per lookup.
+_EMPTY_MAPPING: Mapping[str, Any] = MappingProxyType({})
 
-def auth_per_resource(stacks: List[Stack]):
+
+class AuthResult(NamedTuple):
+    """
+    Authorization status of a function resource that has `Api` or `HttpApi` events
+    """
+
+    # Name of the function resource
+    name: str
+    # Whether authorization is defined for all the `Api` and `HttpApi` events of the function
+    authorized: bool
+
+
+def auth_per_resource(stacks: List[Stack]) -> List[AuthResult]:
     """
     Check if authentication has been set for the function resources defined in the template that have `Api` Event type.
 
@@ -23,58 +55,141 @@ def auth_per_resource(stacks: List[Stack]):
     Returns
     -------
 
-    List of tuples per function resource that have the `Api` or `HttpApi` event types, that describes the resource name
-    and if authorization is required per resource.
+    List of AuthResult tuples per function resource that have the `Api` or `HttpApi` event types, that describes the
+    resource name and if authorization is required per resource. A function is described once, as authorized only if
+    all of its `Api` and `HttpApi` events are.
+
+    """
+    return list(iter_auth_per_resource(stacks))
+
 
+def iter_auth_per_resource(stacks: List[Stack]) -> Iterator[AuthResult]:
     """
+    Same as `auth_per_resource`, but yields the result of each function resource as soon as it is known, letting
+    callers stop early.
 
-    _auth_per_resource: List[Tuple[str, bool]] = []
+    Parameters
+    ----------
+    stacks: List[Stack]
+        The list of stacks where resources are looked for
+
+    Yields
+    ------
+    AuthResult
+        Name and authorization status of a function resource that has `Api` or `HttpApi` event types
+
+    """
+    # Resolving the functions of the stacks is expensive, skip it when no function can have an api event.
+    if not _has_api_event(stacks):
+        return
+
+    # Whether security is defined on a swagger, keyed on the identity of its definition body and the repr of its uri.
+    # Several functions usually refer to the same api, this avoids downloading and parsing its swagger more than once.
+    # Resolved resources are shared per stack, so the same api has the same definition body object for all its
+    # functions, and these resources outlive the cache.
+    swagger_security_cache: Dict[Tuple[int, str], bool] = {}
+    # Stacks are indexed by path once. Their resources are resolved when first needed by one of their functions, and
+    # then shared by all the functions of that stack.
+    stacks_by_path = {stack.stack_path: stack for stack in stacks}
+    resources_by_stack_path: Dict[str, Dict] = {}
 
     sam_function_provider = SamFunctionProvider(stacks, ignore_code_extraction_warnings=True)
     for sam_function in sam_function_provider.get_all():
         # Only check for auth if there are function events defined.
         if sam_function.events:
-            _auth_resource_event(sam_function_provider, sam_function, _auth_per_resource)
+            stack_path = sam_function.stack_path
+            if stack_path not in resources_by_stack_path:
+                resources_by_stack_path[stack_path] = stacks_by_path[stack_path].resources
+            authorized = _auth_resource_event(resources_by_stack_path[stack_path], sam_function, swagger_security_cache)
+            if authorized is not None:
+                yield AuthResult(sam_function.name, authorized)
 
-    return _auth_per_resource
 
+def _has_api_event(stacks: List[Stack]) -> bool:
+    """
+    Check the unprocessed templates for any function resource that has `Api` or `HttpApi` event types. Anything that
+    cannot be checked without processing the template is assumed to have such events.
+
+    Parameters
+    ----------
+    stacks: List[Stack]
+        The list of stacks where resources are looked for
+
+    Returns
+    -------
+    bool
+        Returns if any function resource of the stacks may have `Api` or `HttpApi` event types.
 
-def _auth_resource_event(sam_function_provider: SamFunctionProvider, sam_function, auth_resource_list):
+    """
+    for stack in stacks:
+        resources = (stack.template_dict or _EMPTY_MAPPING).get("Resources") or _EMPTY_MAPPING
+        if not isinstance(resources, Mapping):
+            return True
+        for resource in resources.values():
+            # Entries such as an `Fn::Transform` can expand into functions.
+            if not isinstance(resource, Mapping):
+                return True
+            if resource.get("Type") not in _FUNCTION_TYPES:
+                continue
+            properties = resource.get("Properties") or _EMPTY_MAPPING
+            if not isinstance(properties, Mapping):
+                return True
+            events = properties.get("Events") or _EMPTY_MAPPING
+            if not isinstance(events, Mapping):
+                return True
+            for event in events.values():
+                if not isinstance(event, Mapping):
+                    return True
+                # An event type which is not a string is an intrinsic, which may resolve to an api event type.
+                event_type = event.get("Type")
+                if not isinstance(event_type, str) or event_type in _EVENT_TYPE_TO_ID:
+                    return True
+    return False
+
+
+def _auth_resource_event(
+    resources_dict: Dict, sam_function, swagger_security_cache: Dict[Tuple[int, str], bool]
+) -> Optional[bool]:
     """
 
     Parameters
     ----------
-    sam_function_provider: SamFunctionProvider
+    resources_dict: dict
+        Resolved resources of the stack containing the sam_function
     sam_function: Current function which has all intrinsics resolved.
-    auth_resource_list: List of tuples with function name and auth. eg: [("Name", True)]
+    swagger_security_cache: dict
+        Whether security is defined on the swaggers already read, keyed on their definition body and uri
 
     Returns
     -------
+    bool
+        Returns if authorization is defined for all the `Api` and `HttpApi` events of the function, stopping at the
+        first event without authorization. None, if the function has no such event.
 
     """
+    authorized = None
     for event in sam_function.events.values():
-        for event_type, identifier in [("Api", "RestApiId"), ("HttpApi", "ApiId")]:
-            if event.get("Type") == event_type:
-                # Is there any auth defined directly on the function resource?
-                # NOTE(sriram-mv): How do we check this in more detail?
-                # Currently just checking for presence of Auth, not the details.
-                # https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-property-function-apifunctionauth.html
-                # https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-property-function-httpapifunctionauth.html
-                if event.get("Properties", {}).get("Auth", False):
-                    auth_resource_list.append((sam_function.name, True))
-                # Is there any auth defined on the referred http api or serverless api through the `id` construct?
-                elif _auth_id(
-                    # use the resources containing the sam_function
-                    sam_function_provider.get_resources_by_stack_path(sam_function.stack_path),
-                    event.get("Properties", {}),
-                    identifier,
-                ):
-                    auth_resource_list.append((sam_function.name, True))
-                else:
-                    auth_resource_list.append((sam_function.name, False))
-
-
-def _auth_id(resources_dict, event_properties, identifier):
+        event_type = event.get("Type")
+        # An event type which is not a string is an intrinsic left unresolved, and does not name an api event type.
+        if not isinstance(event_type, str) or event_type not in _EVENT_TYPE_TO_ID:
+            continue
+        identifier = _EVENT_TYPE_TO_ID[event_type]
+        event_properties = event.get("Properties") or _EMPTY_MAPPING
+        # Is there any auth defined directly on the function resource?
+        # NOTE(sriram-mv): How do we check this in more detail?
+        # Currently just checking for presence of Auth, not the details.
+        # https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-property-function-apifunctionauth.html
+        # https://docs.aws.amazon.com/serverless-application-model/latest/developerguide/sam-property-function-httpapifunctionauth.html
+        # If not, is there any auth defined on the referred http api or serverless api through the `id` construct?
+        if not event_properties.get("Auth", False) and not _auth_id(
+            resources_dict, event_properties, identifier, swagger_security_cache
+        ):
+            return False
+        authorized = True
+    return authorized
+
+
+def _auth_id(resources_dict, event_properties, identifier, swagger_security_cache):
     """
 
     Parameters
@@ -85,6 +200,8 @@ def _auth_id(resources_dict, event_properties, identifier):
         Properties of given event supplied to a function resource
     identifier: str
         Id: `ApiId` or `RestApiId`
+    swagger_security_cache: dict
+        Whether security is defined on the swaggers already read, keyed on their definition body and uri
 
     Returns
     -------
@@ -93,19 +210,19 @@ def _auth_id(resources_dict, event_properties, identifier):
 
     """
     resource_name = event_properties.get(identifier, "")
-    api_resource = resources_dict.get(resource_name, {})
-    return any(
-        [
-            api_resource.get("Properties", {}).get("Auth", False),
-            _auth_definition_body_and_uri(
-                definition_body=api_resource.get("Properties", {}).get("DefinitionBody", {}),
-                definition_uri=api_resource.get("Properties", {}).get("DefinitionUri", None),
-            ),
-        ]
+    api_resource = resources_dict.get(resource_name) or _EMPTY_MAPPING
+    api_properties = api_resource.get("Properties") or _EMPTY_MAPPING
+    # Auth defined on the api itself is enough, the swagger does not need to be read.
+    if api_properties.get("Auth", False):
+        return True
+    return _auth_definition_body_and_uri(
+        definition_body=api_properties.get("DefinitionBody") or _EMPTY_MAPPING,
+        definition_uri=api_properties.get("DefinitionUri", None),
+        swagger_security_cache=swagger_security_cache,
     )
 
 
-def _auth_definition_body_and_uri(definition_body, definition_uri):
+def _auth_definition_body_and_uri(definition_body, definition_uri, swagger_security_cache):
     """
 
     Parameters
@@ -114,6 +231,8 @@ def _auth_definition_body_and_uri(definition_body, definition_uri):
         inline definition body defined in the template
     definition_uri: string
         Either an s3 url or a local path to a definition uri
+    swagger_security_cache: dict
+        Whether security is defined on the swaggers already read, keyed on their definition body and uri
 
     Returns
     -------
@@ -122,24 +241,149 @@ def _auth_definition_body_and_uri(definition_body, definition_uri):
 
 
     """
+    cache_key = (id(definition_body), repr(definition_uri))
+    if cache_key not in swagger_security_cache:
+        swagger_security_cache[cache_key] = _swagger_has_security(definition_body, definition_uri)
+    return swagger_security_cache[cache_key]
+
+
+def _swagger_has_security(definition_body, definition_uri):
+    """
+
+    Parameters
+    ----------
+    definition_body: dict
+        inline definition body defined in the template
+    definition_uri: string
+        Either an s3 url or a local path to a definition uri
+
+    Returns
+    -------
+    bool
+        Is security defined on the swagger or not?
+
+    """
+    if not definition_body:
+        has_security = _swagger_file_has_security(definition_uri)
+        if has_security is not None:
+            return has_security
 
     reader = SwaggerReader(definition_body=definition_body, definition_uri=definition_uri)
     swagger = reader.read()
-    _auths = []
     if not swagger:
-        swagger = {}
+        return False
+
+    LOG.debug("Auth checks done on swagger are not exhaustive!")
+
     # NOTE(sriram-mv): Authorization and Authentication is indicated by the `security` scheme.
     # https://swagger.io/docs/specification/authentication/
-    for _, verb in swagger.get("paths", {}).items():
-        for _property in verb.values():
-            # If there are instrinsics in play, they may not be resolved yet.
-            if isinstance(_property, dict):
-                _auths.append(bool(_property.get("security", False)))
+    # This is not an exhaustive check, but to check if there is some form of security setup.
+    if swagger.get("security", False):
+        return True
+    return any(
+        _property.get("security", False)
+        for verb in swagger.get("paths", {}).values()
+        for _property in verb.values()
+        # If there are instrinsics in play, they may not be resolved yet.
+        if isinstance(_property, dict)
+    )
 
-    _auths.append(bool(swagger.get("security", False)))
 
-    if swagger:
-        LOG.debug("Auth checks done on swagger are not exhaustive!")
+def _swagger_file_has_security(definition_uri) -> Optional[bool]:
+    """
+    Stream a local JSON swagger file, stopping at the first `security` field defined at the top level or on an
+    operation, instead of loading the whole document.
 
-    # This is not an exhaustive check, but to check if there is some form of security setup.
-    return any(_auths)
+    Parameters
+    ----------
+    definition_uri: string
+        Either an s3 url or a local path to a definition uri
+
+    Returns
+    -------
+    bool
+        Is security defined on the swagger or not? None, if the swagger cannot be streamed and has to be read in full.
+
+    """
+    if ijson is None or not isinstance(definition_uri, str) or not definition_uri.endswith(".json"):
+        return None
+    if not os.path.isfile(definition_uri):
+        return None
+
+    try:
+        with open(definition_uri, "rb") as fp:
+            has_security = _swagger_events_have_security(ijson.parse(fp))
+    except ijson.JSONError:
+        LOG.debug("Unable to stream swagger file %s, reading it in full", definition_uri)
+        return None
+
+    LOG.debug("Auth checks done on swagger are not exhaustive!")
+    return has_security
+
+
+def _swagger_events_have_security(events: Iterable[Tuple[str, str, Any]]) -> bool:
+    """
+    Go through the parsing events of a swagger document, looking for the same `security` fields as
+    `_swagger_has_security`: a non empty `security` at the top level or under `paths.<path>.<verb>`.
+
+    Parameters
+    ----------
+    events: Iterable[Tuple[str, str, Any]]
+        (prefix, event, value) tuples produced by `ijson.parse`
+
+    Returns
+    -------
+    bool
+        Is security defined on the swagger or not?
+
+    """
+    # Path keys can contain dots, so the path to the current value is tracked here rather than split from the prefix.
+    path: List[Any] = []
+    # Whether the last event opened a `security` map or array, which is truthy if anything else than its end follows.
+    security_opened = False
+    for _, event, value in events:
+        if security_opened:
+            if event not in ("end_map", "end_array"):
+                return True
+            security_opened = False
+
+        if event == "map_key":
+            path[-1] = value
+        elif event in ("end_map", "end_array"):
+            path.pop()
+        else:
+            # `start_map`, `start_array` or a scalar value, located at `path`.
+            if _is_swagger_security_path(path):
+                if event in ("start_map", "start_array"):
+                    security_opened = True
+                elif value:
+                    return True
+            if event == "start_map":
+                path.append(None)
+            elif event == "start_array":
+                path.append(_ARRAY_ITEM)
+    return False
+
+
+def _is_swagger_security_path(path: List[Any]) -> bool:
+    """
+    Parameters
+    ----------
+    path: List[Any]
+        Keys leading to a value of a swagger document, `_ARRAY_ITEM` standing for the items of an array
+
+    Returns
+    -------
+    bool
+        Is the value the `security` of the swagger or of one of its operations?
+
+    """
+    if path == ["security"]:
+        return True
+    return (
+        len(path) == 4
+        and path[0] == "paths"
+        and isinstance(path[1], str)
+        and isinstance(path[2], str)
+        and path[3] == "security"
+    )
@@ -1,23 +1,34 @@
 """
 Contains message used by Schemas paginated CLI.
 """
+import functools
+from types import MappingProxyType
+
+_PAGE_MESSAGE_TEMPLATES = {
+    "single_page": "{title}",
+    "first_page": "{title} [Page {page}/{last_page}] (Enter N for next page)",
+    "middle_page": "{title} [Page {page}/{last_page}] (Enter N/P for next/previous page)",
+    "last_page": "{title} [Page {page}/{last_page}] (Enter P for previous page)",
+}
 
 
 def construct_cli_display_message_for_schemas(page_to_render, last_page_number=None):
-    if last_page_number is None:
-        last_page_number = "many"
-    single_page = "Event Schemas"
-    first_page = "Event Schemas [Page %s/%s] (Enter N for next page)" % (page_to_render, last_page_number)
-    middle_page = "Event Schemas [Page %s/%s] (Enter N/P for next/previous page)" % (page_to_render, last_page_number)
-    last_page = "Event Schemas [Page %s/%s] (Enter P for previous page)" % (page_to_render, last_page_number)
-    return {"single_page": single_page, "first_page": first_page, "middle_page": middle_page, "last_page": last_page}
+    return _construct_cli_display_message("Event Schemas", page_to_render, last_page_number)
 
 
 def construct_cli_display_message_for_registries(page_to_render, last_page_number=None):
+    return _construct_cli_display_message("Schema Registry", page_to_render, last_page_number)
+
+
+# The same pages are rendered again whenever the customer goes back and forth between them. Messages are cached and
+# shared between calls, so they are returned as read-only mappings.
+@functools.lru_cache(maxsize=64)
+def _construct_cli_display_message(title, page_to_render, last_page_number):
     if last_page_number is None:
         last_page_number = "many"
-    single_page = "Schema Registry"
-    first_page = "Schema Registry [Page %s/%s] (Enter N for next page)" % (page_to_render, last_page_number)
-    middle_page = "Schema Registry [Page %s/%s] (Enter N/P for next/previous page)" % (page_to_render, last_page_number)
-    last_page = "Schema Registry [Page %s/%s] (Enter P for previous page)" % (page_to_render, last_page_number)
-    return {"single_page": single_page, "first_page": first_page, "middle_page": middle_page, "last_page": last_page}
+    return MappingProxyType(
+        {
+            message_key: template.format(title=title, page=page_to_render, last_page=last_page_number)
+            for message_key, template in _PAGE_MESSAGE_TEMPLATES.items()
+        }
+    )
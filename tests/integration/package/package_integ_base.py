@@ -58,17 +58,17 @@ class PackageIntegBase(TestCase):
         cls.bucket_name = cls.pre_created_bucket if cls.pre_created_bucket else str(uuid.uuid4())
         cls.test_data_path = Path(__file__).resolve().parents[1].joinpath("testdata", "package")
 
-        # Intialize S3 client
-        s3 = boto3.resource("s3")
+        # Intialize S3 client, shared by the tests which need to inspect uploaded artifacts
+        cls.s3 = boto3.resource("s3")
         cls.ecr = boto3.client("ecr")
         # Use a pre-created KMS Key
         cls.kms_key = os.environ.get("AWS_KMS_KEY")
         # Use a pre-created S3 Bucket if present else create a new one
-        cls.s3_bucket = s3.Bucket(cls.bucket_name)
+        cls.s3_bucket = cls.s3.Bucket(cls.bucket_name)
         if not cls.pre_created_bucket:
             cls.s3_bucket.create()
             time.sleep(SLEEP)
-            bucket_versioning = s3.BucketVersioning(cls.bucket_name)
+            bucket_versioning = cls.s3.BucketVersioning(cls.bucket_name)
             bucket_versioning.enable()
             time.sleep(SLEEP)
         if not cls.pre_created_ecr_repo:
@@ -83,15 +83,17 @@ class PackageIntegBase(TestCase):
     def tearDown(self):
         super().tearDown()
 
-    def base_command(self):
+    @classmethod
+    def base_command(cls):
         command = "sam"
         if os.getenv("SAM_CLI_DEV"):
             command = "samdev"
 
         return command
 
+    @classmethod
     def get_command_list(
-        self,
+        cls,
         s3_bucket=None,
         template=None,
         template_file=None,
@@ -106,7 +108,7 @@ class PackageIntegBase(TestCase):
         image_repositories=None,
         resolve_s3=False,
     ):
-        command_list = [self.base_command(), "package"]
+        command_list = [cls.base_command(), "package"]
 
         if s3_bucket:
             command_list = command_list + ["--s3-bucket", str(s3_bucket)]
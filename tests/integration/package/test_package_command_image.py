@@ -1,11 +1,14 @@
 import os
+import shutil
 import tempfile
-from subprocess import Popen, PIPE, TimeoutExpired
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import DEVNULL, PIPE, run
+from typing import Optional, Tuple
 
 from unittest import skipIf
 from urllib.parse import urlparse
 
-import boto3
 from parameterized import parameterized
 
 import docker
@@ -18,6 +21,39 @@ from tests.testing_utils import RUNNING_ON_CI, RUNNING_TEST_FOR_MASTER_ON_CI, RU
 # This is to restrict package tests to run outside of CI/CD, when the branch is not master and tests are not run by Canary.
 SKIP_PACKAGE_TESTS = RUNNING_ON_CI and RUNNING_TEST_FOR_MASTER_ON_CI and not RUN_BY_CANARY
 TIMEOUT = 300
+# `sam package` runs and image pulls are mostly waiting on the network, so several of them are run at the same time.
+MAX_WORKERS = 4
+
+IMAGE_TEMPLATES = [
+    "aws-serverless-function-image.yaml",
+    "aws-lambda-function-image.yaml",
+    "cdk_v1_synthesized_template_image_functions.json",
+]
+IMAGE_REPOSITORY_TEMPLATES = [
+    "aws-serverless-function-image.yaml",
+    "aws-lambda-function-image.yaml",
+    "aws-lambda-function-image-and-api.yaml",
+    "cdk_v1_synthesized_template_image_functions.json",
+]
+IMAGE_REPOSITORIES_RESOURCES = [
+    ("Hello", "aws-serverless-function-image.yaml"),
+    ("MyLambdaFunction", "aws-lambda-function-image.yaml"),
+    ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_image_functions.json"),
+    ("ColorsRandomFunction", "cdk_v1_synthesized_template_image_functions.json"),
+]
+NESTED_STACK_IMAGE_REPOSITORIES_RESOURCES = [
+    ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
+    ("ColorsRandomFunction", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
+    ("Level2Stack/ColorsRandomFunction", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
+    ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_Level1_nested_image_functions.json"),
+    ("ColorsRandomFunction", "cdk_v1_synthesized_template_Level1_nested_image_functions.json"),
+    (
+        "Level1Stack/Level2Stack/ColorsRandomFunction",
+        "cdk_v1_synthesized_template_Level1_nested_image_functions.json",
+    ),
+]
+NESTED_APPLICATION_TEMPLATES = ["aws-serverless-application-image.yaml"]
+DEEP_NESTED_TEMPLATE = os.path.join("deep-nested-image", "template.yaml")
 
 
 @skipIf(SKIP_PACKAGE_TESTS, "Skip package tests in CI/CD only")
@@ -28,196 +64,185 @@ class TestPackageImage(PackageIntegBase):
         cls.local_images = [
             ("public.ecr.aws/sam/emulation-python3.8", "latest"),
         ]
-        # setup some images locally by pulling them.
-        for repo, tag in cls.local_images:
-            cls.docker_client.api.pull(repository=repo, tag=tag)
-            cls.docker_client.api.tag(f"{repo}:{tag}", "emulation-python3.8", tag="latest")
-            cls.docker_client.api.tag(f"{repo}:{tag}", "emulation-python3.8-2", tag="latest")
-            cls.docker_client.api.tag(f"{repo}:{tag}", "colorsrandomfunctionf61b9209", tag="latest")
+        # setup some images locally by pulling them, pulls are waiting on the registry so they are run concurrently.
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(cls.local_images))) as executor:
+            # consume the results so that a failed pull fails the class setup
+            list(executor.map(cls._pull_and_tag_image, cls.local_images))
 
         super(TestPackageImage, cls).setUpClass()
 
+        cls.packaged_dir = tempfile.mkdtemp()
+        # The `sam package` commands are independent of each other, so they are all started concurrently here and
+        # every test asserts on the result of its own command. A command which fails or times out only fails the
+        # test waiting on its result.
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            cls.package_results = {
+                key: executor.submit(cls._run_sam, command_list, **output_options)
+                for key, (command_list, output_options) in cls._get_package_commands().items()
+            }
+
+    @classmethod
+    def _run_sam(
+        cls, command_list, *, want_stdout=False, want_stderr=False
+    ) -> Tuple[int, Optional[str], Optional[str]]:
+        """
+        Runs the command and returns its return code with its decoded stdout and stderr. Output streams which are not
+        wanted are discarded instead of buffered, and returned as None.
+        """
+        process = run(
+            command_list,
+            stdout=PIPE if want_stdout else DEVNULL,
+            stderr=PIPE if want_stderr else DEVNULL,
+            timeout=TIMEOUT,
+            encoding="utf-8",
+        )
+        return process.returncode, process.stdout, process.stderr
+
+    @classmethod
+    def _pull_and_tag_image(cls, image):
+        repo, tag = image
+        cls.docker_client.api.pull(repository=repo, tag=tag)
+        cls.docker_client.api.tag(f"{repo}:{tag}", "emulation-python3.8", tag="latest")
+        cls.docker_client.api.tag(f"{repo}:{tag}", "emulation-python3.8-2", tag="latest")
+        cls.docker_client.api.tag(f"{repo}:{tag}", "colorsrandomfunctionf61b9209", tag="latest")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.packaged_dir, ignore_errors=True)
+        super(TestPackageImage, cls).tearDownClass()
+
+    @classmethod
+    def _get_package_commands(cls):
+        """
+        Returns the command list of every `sam package` run by this class, along with the output streams its test
+        asserts on, keyed on the test and parameters they belong to.
+        """
+        commands = {}
+        for template_file in IMAGE_TEMPLATES:
+            template_path = cls.test_data_path.joinpath(template_file)
+            commands[("without_image_repository", template_file)] = (
+                cls.get_command_list(template=template_path),
+                {"want_stderr": True},
+            )
+            commands[("non_ecr_repo_uri_image_repository", template_file)] = (
+                cls.get_command_list(image_repository="non-ecr-repo-uri", template=template_path, resolve_s3=True),
+                {"want_stderr": True},
+            )
+            commands[("s3_bucket", template_file)] = (
+                cls.get_command_list(s3_bucket=cls.s3_bucket, s3_prefix=uuid.uuid4().hex, template=template_path),
+                {"want_stderr": True},
+            )
+        for template_file in IMAGE_REPOSITORY_TEMPLATES:
+            commands[("image_repository", template_file)] = (
+                cls.get_command_list(
+                    image_repository=cls.ecr_repo_name, template=cls.test_data_path.joinpath(template_file)
+                ),
+                {"want_stdout": True},
+            )
+        for resource_id, template_file in IMAGE_REPOSITORIES_RESOURCES:
+            commands[("image_repositories", resource_id, template_file)] = (
+                cls.get_command_list(
+                    image_repositories=f"{resource_id}={cls.ecr_repo_name}",
+                    template=cls.test_data_path.joinpath(template_file),
+                ),
+                {"want_stdout": True},
+            )
+        for resource_id, template_file in NESTED_STACK_IMAGE_REPOSITORIES_RESOURCES:
+            commands[("image_repositories_nested_stack", resource_id, template_file)] = (
+                cls.get_command_list(
+                    image_repositories=f"{resource_id}={cls.ecr_repo_name}",
+                    template=cls.test_data_path.joinpath(template_file),
+                    resolve_s3=True,
+                ),
+                {"want_stderr": True},
+            )
+        for template_file in NESTED_APPLICATION_TEMPLATES:
+            # only the packaged template written to the output file is verified
+            commands[("nested_application", template_file)] = (
+                cls.get_command_list(
+                    image_repository=cls.ecr_repo_name,
+                    template=cls.test_data_path.joinpath(template_file),
+                    resolve_s3=True,
+                    output_template_file=cls._get_packaged_file_path(template_file),
+                ),
+                {},
+            )
+        commands[("deep_nested", DEEP_NESTED_TEMPLATE)] = (
+            cls.get_command_list(
+                image_repository=cls.ecr_repo_name,
+                resolve_s3=True,
+                template=cls.test_data_path.joinpath(DEEP_NESTED_TEMPLATE),
+                force_upload=True,
+            ),
+            {"want_stderr": True},
+        )
+        return commands
+
+    @classmethod
+    def _get_packaged_file_path(cls, template_file):
+        return os.path.join(cls.packaged_dir, f"packaged-{template_file}")
+
     def setUp(self):
         super(TestPackageImage, self).setUp()
 
     def tearDown(self):
         super(TestPackageImage, self).tearDown()
 
-    @parameterized.expand(
-        [
-            "aws-serverless-function-image.yaml",
-            "aws-lambda-function-image.yaml",
-            "cdk_v1_synthesized_template_image_functions.json",
-        ]
-    )
+    @parameterized.expand(IMAGE_TEMPLATES)
     def test_package_template_without_image_repository(self, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(template=template_path)
-
-        process = Popen(command_list, stdout=PIPE, stderr=PIPE)
-        try:
-            stdout, stderr = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stderr = stderr.strip()
-
-        self.assertIn("Error: Missing option '--image-repository'", process_stderr.decode("utf-8"))
-        self.assertEqual(2, process.returncode)
-
-    @parameterized.expand(
-        [
-            "aws-serverless-function-image.yaml",
-            "aws-lambda-function-image.yaml",
-            "aws-lambda-function-image-and-api.yaml",
-            "cdk_v1_synthesized_template_image_functions.json",
-        ]
-    )
+        returncode, _, stderr = self.package_results[("without_image_repository", template_file)].result()
+
+        self.assertIn("Error: Missing option '--image-repository'", stderr)
+        self.assertEqual(2, returncode)
+
+    @parameterized.expand(IMAGE_REPOSITORY_TEMPLATES)
     def test_package_template_with_image_repository(self, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(image_repository=self.ecr_repo_name, template=template_path)
-
-        process = Popen(command_list, stdout=PIPE)
-        try:
-            stdout, _ = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stdout = stdout.strip()
-
-        self.assertEqual(0, process.returncode)
-        self.assertIn(f"{self.ecr_repo_name}", process_stdout.decode("utf-8"))
-
-    @parameterized.expand(
-        [
-            ("Hello", "aws-serverless-function-image.yaml"),
-            ("MyLambdaFunction", "aws-lambda-function-image.yaml"),
-            ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_image_functions.json"),
-            ("ColorsRandomFunction", "cdk_v1_synthesized_template_image_functions.json"),
-        ]
-    )
+        returncode, stdout, _ = self.package_results[("image_repository", template_file)].result()
+
+        self.assertEqual(0, returncode)
+        self.assertIn(f"{self.ecr_repo_name}", stdout)
+
+    @parameterized.expand(IMAGE_REPOSITORIES_RESOURCES)
     def test_package_template_with_image_repositories(self, resource_id, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(
-            image_repositories=f"{resource_id}={self.ecr_repo_name}", template=template_path
-        )
+        returncode, stdout, _ = self.package_results[("image_repositories", resource_id, template_file)].result()
 
-        process = Popen(command_list, stdout=PIPE)
-        try:
-            stdout, _ = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stdout = stdout.strip()
-
-        self.assertIn(f"{self.ecr_repo_name}", process_stdout.decode("utf-8"))
-        self.assertEqual(0, process.returncode)
-
-    @parameterized.expand(
-        [
-            ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
-            ("ColorsRandomFunction", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
-            ("Level2Stack/ColorsRandomFunction", "cdk_v1_synthesized_template_Level2_nested_image_functions.json"),
-            ("ColorsRandomFunctionF61B9209", "cdk_v1_synthesized_template_Level1_nested_image_functions.json"),
-            ("ColorsRandomFunction", "cdk_v1_synthesized_template_Level1_nested_image_functions.json"),
-            (
-                "Level1Stack/Level2Stack/ColorsRandomFunction",
-                "cdk_v1_synthesized_template_Level1_nested_image_functions.json",
-            ),
-        ]
-    )
+        self.assertIn(f"{self.ecr_repo_name}", stdout)
+        self.assertEqual(0, returncode)
+
+    @parameterized.expand(NESTED_STACK_IMAGE_REPOSITORIES_RESOURCES)
     def test_package_template_with_image_repositories_nested_stack(self, resource_id, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(
-            image_repositories=f"{resource_id}={self.ecr_repo_name}", template=template_path, resolve_s3=True
-        )
+        returncode, _, stderr = self.package_results[
+            ("image_repositories_nested_stack", resource_id, template_file)
+        ].result()
 
-        process = Popen(command_list, stderr=PIPE)
-        try:
-            _, stderr = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-
-        process_stderr = stderr.strip()
-        self.assertIn(f"{self.ecr_repo_name}", process_stderr.decode("utf-8"))
-        self.assertEqual(0, process.returncode)
-
-    @parameterized.expand(
-        [
-            "aws-serverless-function-image.yaml",
-            "aws-lambda-function-image.yaml",
-            "cdk_v1_synthesized_template_image_functions.json",
-        ]
-    )
+        self.assertIn(f"{self.ecr_repo_name}", stderr)
+        self.assertEqual(0, returncode)
+
+    @parameterized.expand(IMAGE_TEMPLATES)
     def test_package_template_with_non_ecr_repo_uri_image_repository(self, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(
-            image_repository="non-ecr-repo-uri", template=template_path, resolve_s3=True
-        )
+        returncode, _, stderr = self.package_results[("non_ecr_repo_uri_image_repository", template_file)].result()
 
-        process = Popen(command_list, stderr=PIPE)
-        try:
-            _, stderr = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stderr = stderr.strip()
-
-        self.assertEqual(2, process.returncode)
-        self.assertIn("Error: Invalid value for '--image-repository'", process_stderr.decode("utf-8"))
-
-    @parameterized.expand(
-        [
-            "aws-serverless-function-image.yaml",
-            "aws-lambda-function-image.yaml",
-            "cdk_v1_synthesized_template_image_functions.json",
-        ]
-    )
-    def test_package_template_and_s3_bucket(self, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(s3_bucket=self.s3_bucket, s3_prefix=self.s3_prefix, template=template_path)
+        self.assertEqual(2, returncode)
+        self.assertIn("Error: Invalid value for '--image-repository'", stderr)
 
-        process = Popen(command_list, stdout=PIPE, stderr=PIPE)
-        try:
-            _, stderr = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stderr = stderr.strip()
+    @parameterized.expand(IMAGE_TEMPLATES)
+    def test_package_template_and_s3_bucket(self, template_file):
+        returncode, _, stderr = self.package_results[("s3_bucket", template_file)].result()
 
-        self.assertEqual(2, process.returncode)
-        self.assertIn("Error: Missing option '--image-repository'", process_stderr.decode("utf-8"))
+        self.assertEqual(2, returncode)
+        self.assertIn("Error: Missing option '--image-repository'", stderr)
 
-    @parameterized.expand(["aws-serverless-application-image.yaml"])
+    @parameterized.expand(NESTED_APPLICATION_TEMPLATES)
     def test_package_template_with_image_function_in_nested_application(self, template_file):
-        template_path = self.test_data_path.joinpath(template_file)
-
         # when image function is not in main template, erc_repo_name does not show up in stdout
         # here we download the nested application template file and verify its content
-        with tempfile.NamedTemporaryFile() as packaged_file, tempfile.TemporaryFile() as packaged_nested_file:
-            # https://docs.python.org/3/library/tempfile.html#tempfile.NamedTemporaryFile
-            # Closes the NamedTemporaryFile as on Windows NT or later, NamedTemporaryFile cannot be opened twice.
-            packaged_file.close()
-
-            command_list = self.get_command_list(
-                image_repository=self.ecr_repo_name,
-                template=template_path,
-                resolve_s3=True,
-                output_template_file=packaged_file.name,
-            )
-
-            process = Popen(command_list, stdout=PIPE, stderr=PIPE)
-            try:
-                process.communicate(timeout=TIMEOUT)
-            except TimeoutExpired:
-                process.kill()
-                raise
+        returncode, _, _ = self.package_results[("nested_application", template_file)].result()
 
-            self.assertEqual(0, process.returncode)
+        self.assertEqual(0, returncode)
 
+        with tempfile.TemporaryFile() as packaged_nested_file:
             # download the root template and locate nested template url
-            template_dict = get_template_data(packaged_file.name)
+            template_dict = get_template_data(self._get_packaged_file_path(template_file))
             nested_app_template_uri = (
                 template_dict.get("Resources", {}).get("myApp", {}).get("Properties").get("Location")
             )
@@ -227,8 +252,7 @@ class TestPackageImage(PackageIntegBase):
             bucket_name, key = parsed.path.lstrip("/").split("/")
 
             # download and verify it contains ecr_repo_name
-            s3 = boto3.resource("s3")
-            s3.Object(bucket_name, key).download_fileobj(packaged_nested_file)
+            self.s3.Object(bucket_name, key).download_fileobj(packaged_nested_file)
             packaged_nested_file.seek(0)
             self.assertIn(f"{self.ecr_repo_name}", packaged_nested_file.read().decode())
 
@@ -242,20 +266,7 @@ class TestPackageImage(PackageIntegBase):
             - ChildStackY
               - FunctionA
         """
-        template_file = os.path.join("deep-nested-image", "template.yaml")
-
-        template_path = self.test_data_path.joinpath(template_file)
-        command_list = self.get_command_list(
-            image_repository=self.ecr_repo_name, resolve_s3=True, template=template_path, force_upload=True
-        )
-
-        process = Popen(command_list, stdout=PIPE, stderr=PIPE)
-        try:
-            _, stderr = process.communicate(timeout=TIMEOUT)
-        except TimeoutExpired:
-            process.kill()
-            raise
-        process_stderr = stderr.strip().decode("utf-8")
+        _, _, stderr = self.package_results[("deep_nested", DEEP_NESTED_TEMPLATE)].result()
 
         # verify all function images are pushed
         images = [
@@ -265,4 +276,4 @@ class TestPackageImage(PackageIntegBase):
         for image, tag in images:
             # check string like this:
             # ...python-ce689abb4f0d-3.9-slim: digest:...
-            self.assertRegex(process_stderr, fr"{image}-.+-{tag}: digest:")
+            self.assertRegex(stderr, fr"{image}-.+-{tag}: digest:")
@@ -1,9 +1,28 @@
+import io
+import json
+import os
+import tempfile
 from collections import OrderedDict
+from copy import deepcopy
 
-from unittest import TestCase
+from unittest import TestCase, skipIf
+from unittest.mock import patch
 
-from samcli.commands.deploy.auth_utils import auth_per_resource
+from parameterized import parameterized
+
+from samcli.commands.deploy.auth_utils import (
+    AuthResult,
+    auth_per_resource,
+    iter_auth_per_resource,
+    _swagger_events_have_security,
+)
 from samcli.lib.providers.provider import Stack
+from samcli.lib.providers.sam_function_provider import SamFunctionProvider
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 class TestAuthUtils(TestCase):
@@ -149,3 +168,317 @@ class TestAuthUtils(TestCase):
         _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
 
         self.assertEqual(_auth_per_resource, [("HelloWorldFunction", False)])
+
+    @patch("samcli.commands.deploy.auth_utils.SwaggerReader")
+    def test_swagger_read_once_per_api(self, swagger_reader_mock):
+        swagger_reader_mock.return_value.read.return_value = {"paths": {"/hello": {"get": {"security": ["OAuth2"]}}}}
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                ("Properties", OrderedDict([("StageName", "Prod"), ("DefinitionUri", "s3://bucket/swagger.yaml")])),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        self.template_dict["Resources"]["GoodbyeWorldFunction"] = deepcopy(
+            self.template_dict["Resources"]["HelloWorldFunction"]
+        )
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True), ("GoodbyeWorldFunction", True)])
+        swagger_reader_mock.assert_called_once_with(definition_body={}, definition_uri="s3://bucket/swagger.yaml")
+
+    @patch("samcli.commands.deploy.auth_utils.SwaggerReader")
+    def test_swagger_read_once_per_api_with_interleaved_iterators(self, swagger_reader_mock):
+        swagger_reader_mock.return_value.read.return_value = {"paths": {"/hello": {"get": {"security": ["OAuth2"]}}}}
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                ("Properties", OrderedDict([("StageName", "Prod"), ("DefinitionBody", {"swagger": "2.0"})])),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        self.template_dict["Resources"]["GoodbyeWorldFunction"] = deepcopy(
+            self.template_dict["Resources"]["HelloWorldFunction"]
+        )
+        first = iter_auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+        second = iter_auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(next(first), ("HelloWorldFunction", True))
+        self.assertEqual(next(second), ("HelloWorldFunction", True))
+        self.assertEqual(list(first), [("GoodbyeWorldFunction", True)])
+        self.assertEqual(list(second), [("GoodbyeWorldFunction", True)])
+        # Each iterator reads the swagger once, regardless of the other one.
+        self.assertEqual(swagger_reader_mock.call_count, 2)
+
+    @patch.object(SamFunctionProvider, "get_resources_by_stack_path")
+    def test_resources_not_looked_up_through_function_provider(self, get_resources_by_stack_path_mock):
+        self.template_dict["Resources"]["GoodbyeWorldFunction"] = deepcopy(
+            self.template_dict["Resources"]["HelloWorldFunction"]
+        )
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", False), ("GoodbyeWorldFunction", False)])
+        get_resources_by_stack_path_mock.assert_not_called()
+
+    def test_auth_supplied_via_definition_body_top_level_security(self):
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                (
+                    "Properties",
+                    OrderedDict(
+                        [
+                            ("StageName", "Prod"),
+                            (
+                                "DefinitionBody",
+                                {
+                                    "swagger": "2.0",
+                                    "info": {"version": "1.0", "title": "local"},
+                                    "security": [{"OAuth2": []}],
+                                    "paths": {"/hello": {"get": {}}},
+                                },
+                            ),
+                        ]
+                    ),
+                ),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+
+    def test_auth_supplied_via_definition_body_with_int_and_str_response_keys(self):
+        # YAML loads unquoted status codes as ints, so response keys mix int and str
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                (
+                    "Properties",
+                    OrderedDict(
+                        [
+                            ("StageName", "Prod"),
+                            (
+                                "DefinitionBody",
+                                {
+                                    "swagger": "2.0",
+                                    "info": {"version": "1.0", "title": "local"},
+                                    "paths": {
+                                        "/hello": {
+                                            "get": {
+                                                "security": [{"OAuth2": []}],
+                                                "responses": {200: {"description": "ok"}, "default": {}},
+                                            }
+                                        }
+                                    },
+                                },
+                            ),
+                        ]
+                    ),
+                ),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        self.template_dict["Resources"]["GoodbyeWorldFunction"] = deepcopy(
+            self.template_dict["Resources"]["HelloWorldFunction"]
+        )
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True), ("GoodbyeWorldFunction", True)])
+
+    def test_paths_not_inspected_when_top_level_security_defined(self):
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                (
+                    "Properties",
+                    OrderedDict(
+                        [
+                            ("StageName", "Prod"),
+                            (
+                                "DefinitionBody",
+                                # paths which are not maps of operations would fail to be inspected
+                                {"swagger": "2.0", "security": [{"OAuth2": []}], "paths": {"/hello": ["get"]}},
+                            ),
+                        ]
+                    ),
+                ),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+
+    @skipIf(ijson is None, "ijson is not installed")
+    @patch("samcli.commands.deploy.auth_utils.SwaggerReader")
+    def test_auth_supplied_via_definition_uri_json_file_is_streamed(self, swagger_reader_mock):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as swagger_file:
+            json.dump({"swagger": "2.0", "paths": {"/hello": {"get": {"security": [{"OAuth2": []}]}}}}, swagger_file)
+        self.addCleanup(os.remove, swagger_file.name)
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                ("Properties", OrderedDict([("StageName", "Prod"), ("DefinitionUri", swagger_file.name)])),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+        swagger_reader_mock.assert_not_called()
+
+    @patch("samcli.commands.deploy.auth_utils.ijson", None)
+    @patch("samcli.commands.deploy.auth_utils.SwaggerReader")
+    def test_auth_supplied_via_definition_uri_json_file_is_read_without_ijson(self, swagger_reader_mock):
+        swagger_reader_mock.return_value.read.return_value = {"paths": {"/hello": {"get": {"security": ["OAuth2"]}}}}
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                ("Properties", OrderedDict([("StageName", "Prod"), ("DefinitionUri", "swagger.json")])),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+        swagger_reader_mock.assert_called_once_with(definition_body={}, definition_uri="swagger.json")
+
+    @patch("samcli.commands.deploy.auth_utils.SwaggerReader")
+    def test_swagger_not_read_when_auth_defined_on_api_resource(self, swagger_reader_mock):
+        self.template_dict["Resources"]["HelloWorldApi"] = OrderedDict(
+            [
+                ("Type", "AWS::Serverless::Api"),
+                (
+                    "Properties",
+                    OrderedDict(
+                        [
+                            ("StageName", "Prod"),
+                            ("Auth", OrderedDict([("ApiKeyRequired", True)])),
+                            ("DefinitionUri", "s3://bucket/swagger.yaml"),
+                        ]
+                    ),
+                ),
+            ]
+        )
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Properties"][
+            "RestApiId"
+        ] = {"Ref": "HelloWorldApi"}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+        swagger_reader_mock.assert_not_called()
+
+    def test_auth_per_resource_described_once_per_function(self):
+        events = self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]
+        events["HelloWorld"]["Properties"]["Auth"] = {"ApiKeyRequired": True}
+        events["GoodbyeWorld"] = deepcopy(events["HelloWorld"])
+        events["GoodbyeWorld"]["Properties"]["Path"] = "/goodbye"
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", True)])
+
+    def test_auth_per_resource_not_authorized_when_any_event_has_no_auth(self):
+        events = self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]
+        events["GoodbyeWorld"] = deepcopy(events["HelloWorld"])
+        events["GoodbyeWorld"]["Properties"]["Path"] = "/goodbye"
+        events["GoodbyeWorld"]["Properties"]["Auth"] = {"ApiKeyRequired": True}
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [("HelloWorldFunction", False)])
+
+    def test_auth_per_resource_ignores_functions_without_api_events(self):
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"] = OrderedDict(
+            [("Type", "Schedule"), ("Properties", OrderedDict([("Schedule", "rate(1 minute)")]))]
+        )
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [])
+
+    def test_auth_per_resource_ignores_unresolved_event_type(self):
+        # Imported values are left unresolved when the template is processed locally.
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Type"] = {
+            "Fn::ImportValue": "EventType"
+        }
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [])
+
+    def test_iter_auth_per_resource(self):
+        auth_results = iter_auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        auth_result = next(auth_results)
+        self.assertEqual(auth_result, AuthResult(name="HelloWorldFunction", authorized=False))
+        self.assertEqual((auth_result.name, auth_result.authorized), ("HelloWorldFunction", False))
+        self.assertIsNone(next(auth_results, None))
+
+    @patch("samcli.commands.deploy.auth_utils.SamFunctionProvider")
+    def test_functions_not_resolved_without_api_events(self, sam_function_provider_mock):
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Type"] = "SQS"
+        _auth_per_resource = auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        self.assertEqual(_auth_per_resource, [])
+        sam_function_provider_mock.assert_not_called()
+
+    @patch("samcli.commands.deploy.auth_utils.SamFunctionProvider")
+    def test_functions_resolved_when_events_need_resolving(self, sam_function_provider_mock):
+        sam_function_provider_mock.return_value.get_all.return_value = []
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"] = {
+            "Fn::If": ["Condition", {"HelloWorld": {"Type": "Api"}}, {"Ref": "AWS::NoValue"}]
+        }
+        auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        sam_function_provider_mock.assert_called_once()
+
+    @patch("samcli.commands.deploy.auth_utils.SamFunctionProvider")
+    def test_functions_resolved_when_event_type_needs_resolving(self, sam_function_provider_mock):
+        sam_function_provider_mock.return_value.get_all.return_value = []
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Type"] = {
+            "Ref": "EventType"
+        }
+        auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        sam_function_provider_mock.assert_called_once()
+
+    @patch("samcli.commands.deploy.auth_utils.SamFunctionProvider")
+    def test_functions_resolved_when_resources_need_resolving(self, sam_function_provider_mock):
+        sam_function_provider_mock.return_value.get_all.return_value = []
+        self.template_dict["Resources"]["Fn::Transform"] = [
+            {"Name": "AWS::Include", "Parameters": {"Location": "s3://bucket/functions.yaml"}}
+        ]
+        self.template_dict["Resources"]["HelloWorldFunction"]["Properties"]["Events"]["HelloWorld"]["Type"] = "SQS"
+        auth_per_resource([Stack("", "", "", {}, self.template_dict)])
+
+        sam_function_provider_mock.assert_called_once()
+
+
+@skipIf(ijson is None, "ijson is not installed")
+class TestSwaggerEventsHaveSecurity(TestCase):
+    @parameterized.expand(
+        [
+            ({"security": [{"OAuth2": []}], "paths": {}}, True),
+            ({"security": [], "paths": {"/hello": {"get": {}}}}, False),
+            ({"paths": {"/hello.v1": {"get": {"security": [{"OAuth2": []}]}}}}, True),
+            ({"paths": {"/hello": {"get": {"security": {}}}}}, False),
+            ({"paths": {"/hello": {"get": {"responses": {"200": {"security": True}}}}}}, False),
+            ({"paths": {"/hello": {"Fn::If": ["Condition", {"get": {"security": True}}, {}]}}}, False),
+            ({"info": {"security": True}, "paths": {"/hello": {"get": {}, "post": {"security": True}}}}, True),
+        ]
+    )
+    def test_swagger_events_have_security(self, swagger, expected):
+        events = ijson.parse(io.BytesIO(json.dumps(swagger).encode("utf-8")))
+        self.assertEqual(_swagger_events_have_security(events), expected)
@@ -24,3 +24,12 @@ class TestSchemasCLIMessageGenerator(TestCase):
         )
         self.assertEqual(cli_display_message["first_page"], "Schema Registry [Page 2/many] (Enter N for next page)")
         self.assertEqual(cli_display_message["single_page"], "Schema Registry")
+
+    def test_construct_cli_display_message_is_reused_for_same_page(self):
+        cli_display_message = construct_cli_display_message_for_schemas(3, 5)
+        self.assertIs(cli_display_message, construct_cli_display_message_for_schemas(3, 5))
+        self.assertEqual(
+            cli_display_message["middle_page"], "Event Schemas [Page 3/5] (Enter N/P for next/previous page)"
+        )
+        with self.assertRaises(TypeError):
+            cli_display_message["middle_page"] = "changed"